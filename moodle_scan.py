@@ -10,29 +10,53 @@ TAU Moodle scanner (GitHub Actions-ready):
 - If there is an error -> send Telegram message with the GitHub Actions run link + traceback
 """
 
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+import asyncio
 from datetime import datetime, timezone, timedelta
-from email.utils import parsedate_to_datetime
-from urllib.parse import unquote, urlparse
+from email.utils import format_datetime, parsedate_to_datetime
+from html import unescape as _html_unescape
+from urllib.parse import unquote, urljoin, urlparse
 import json
 import os
 import re
-import time
 import traceback
 
 import requests
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# selenium is imported lazily inside the fallback-path functions below; runs
+# that reuse a cached cookie or complete the HTTP SSO never pay its import cost.
 
 try:
     from bs4 import BeautifulSoup
 except ImportError:
     raise SystemExit("Missing bs4. Install: pip install beautifulsoup4")
 
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    raise SystemExit("Missing aiohttp. Install: pip install aiohttp")
+
+# orjson serializes the (now cache-heavy) state file ~5-10x faster than stdlib
+# json; fall back silently if it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Prefer the C-based lxml parser (much faster than the pure-Python html.parser);
+# fall back silently if lxml isn't installed.
+try:
+    import lxml  # noqa: F401
+    BS_PARSER = "lxml"
+except ImportError:
+    BS_PARSER = "html.parser"
+
 try:
     from zoneinfo import ZoneInfo
 except ImportError:
@@ -52,6 +76,9 @@ HEADLESS = True
 
 STATE_FILE = "last_run.json"  # will be created/updated in repo
 
+# Network I/O dominates the scan; the Moodle server handles this concurrency fine.
+SCAN_WORKERS = 16
+
 
 # ==========================
 # SECRETS (from GitHub Actions)
@@ -65,6 +92,11 @@ PASSWORD = os.environ.get("MOODLE_PASSWORD", "")
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "")
 
+# Optional: Fernet key used to cache the Moodle session cookie between runs.
+# last_run.json is committed to the repo, so the cookie is only ever persisted
+# encrypted; without this secret we simply re-login on every run.
+STATE_COOKIE_KEY = os.environ.get("STATE_COOKIE_KEY", "")
+
 
 # ==========================
 # DATA
@@ -83,16 +115,31 @@ class FoundFile:
 # HELPERS
 # ==========================
 
+# One compiled scan per href instead of four independent substring checks.
+_ACT_RE = re.compile(
+    r"moodle\.tau\.ac\.il/(pluginfile\.php/|mod/(?:resource|folder|assign)/view\.php)"
+)
+_MOD_VIEW_RE = re.compile(r"mod/(?:resource|folder|assign)/view\.php")
+_COURSE_PREFIX_RE = re.compile(r"\d{6,}")
+# Raw-markup link extraction: grab each <a> tag, then find its href inside it.
+# The lookbehind keeps attributes like data-href / xhref from matching, and
+# searching within the tag (rather than lazily from "<a") means a real href
+# after such an attribute is still found. Comments and <script> bodies are
+# stripped first — bs4 never surfaced links from those.
+_A_TAG_RE = re.compile(r"<a\s[^>]*", re.IGNORECASE)
+_HREF_RE = re.compile(r"""(?<![\w-])href\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_SKIP_BLOCK_RE = re.compile(r"<!--.*?-->|<script\b.*?</script>", re.IGNORECASE | re.DOTALL)
+
+
 def _course_display_name(raw: str) -> str:
     """
     Convert '05092843 - אנליזה הרמונית' -> 'אנליזה הרמונית'
     Keep others as-is.
     """
     s = (raw or "").strip()
-    if " - " in s:
-        left, right = s.split(" - ", 1)
-        if re.fullmatch(r"\d{6,}", left.strip()):
-            s = right.strip()
+    left, sep, right = s.partition(" - ")
+    if sep and _COURSE_PREFIX_RE.fullmatch(left.strip()):
+        s = right.strip()
     return s
 
 
@@ -103,21 +150,59 @@ def _safe_filename_from_url(url: str) -> str:
     return name or url
 
 
-def _parse_http_last_modified(headers) -> datetime | None:
-    lm = headers.get("Last-Modified") or headers.get("last-modified")
-    if not lm:
-        return None
+def _parse_http_date(value: str) -> datetime | None:
+    """
+    Parse an HTTP date to an aware UTC datetime. Moodle's Apache always emits
+    the fixed RFC 7231 form ("Wed, 21 Oct 2015 07:28:00 GMT"), so try a direct
+    strptime first (~3x faster) and keep the general RFC 2822 parser as the
+    fallback for non-conforming headers. Callers convert to TZ_IL only for the
+    files they actually report.
+    """
+    try:
+        return datetime.strptime(value, "%a, %d %b %Y %H:%M:%S GMT").replace(tzinfo=timezone.utc)
+    except ValueError:
+        pass
     try:
-        dt = parsedate_to_datetime(lm)
+        dt = parsedate_to_datetime(value)
         if dt.tzinfo is None:
             dt = dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(TZ_IL)
+        return dt
     except Exception:
         return None
 
 
-def _session_from_selenium_cookies(driver: webdriver.Chrome) -> requests.Session:
+def _build_session() -> requests.Session:
     s = requests.Session()
+
+    # Keep-alive pool with retries for the requests-based paths (SSO, the
+    # course list, Telegram). The scan fan-out itself runs on aiohttp, which
+    # mirrors these retry semantics via _retrying_get.
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=["HEAD", "GET"],
+        ),
+    )
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({
+        "User-Agent": (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+        ),
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    return s
+
+
+def _session_from_selenium_cookies(driver: "webdriver.Chrome") -> requests.Session:
+    s = _build_session()
+
     try:
         ua = driver.execute_script("return navigator.userAgent;")
         s.headers.update({"User-Agent": ua})
@@ -134,28 +219,118 @@ def _session_from_selenium_cookies(driver: webdriver.Chrome) -> requests.Session
     return s
 
 
-def _http_head_follow(session: requests.Session, url: str) -> requests.Response | None:
+def _http_get_html(session: requests.Session, url: str) -> str | None:
     try:
-        r = session.head(url, allow_redirects=True, timeout=30)
-        if r.status_code in (403, 405) or (r.status_code >= 400 and "Last-Modified" not in r.headers):
-            r = session.get(url, allow_redirects=True, timeout=30, stream=True)
+        r = session.get(url, allow_redirects=True, timeout=40)
+        if r.status_code >= 400:
+            return None
+        return r.text
+    except Exception:
+        return None
+
+
+# Mirror the requests session's Retry(total=3, backoff_factor=0.3,
+# status_forcelist=[500,502,503,504]) on the aiohttp scan path, so a transient
+# error doesn't silently drop a course page or file for the run.
+_RETRY_STATUSES = frozenset({500, 502, 503, 504})
+_RETRY_TOTAL = 3
+_RETRY_BACKOFF = 0.3
+
+
+async def _retrying_get(client: aiohttp.ClientSession, url: str, **kwargs) -> aiohttp.ClientResponse:
+    last_exc: Exception | None = None
+    for attempt in range(_RETRY_TOTAL + 1):
+        if attempt:
+            await asyncio.sleep(_RETRY_BACKOFF * (2 ** (attempt - 1)))
+        try:
+            r = await client.get(url, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            last_exc = e
+            continue
+        if r.status in _RETRY_STATUSES and attempt < _RETRY_TOTAL:
+            r.close()
+            continue
         return r
+    raise last_exc if last_exc is not None else aiohttp.ClientError(f"retries exhausted for {url}")
+
+
+async def _probe_headers(client: aiohttp.ClientSession, url: str,
+                         headers: dict | None = None) -> tuple | None:
+    """
+    Probe a URL's headers with a single ranged GET (Range: bytes=0-0) instead
+    of a HEAD plus a full fallback GET when Moodle answers the HEAD with
+    403/405. Servers honoring Range reply 206 with full headers and one byte;
+    the rest reply 200 and we just never read the body.
+    Returns (status, headers, final_url) or None on error.
+    """
+    req_headers = {"Range": "bytes=0-0"}
+    if headers:
+        req_headers.update(headers)
+    try:
+        r = await _retrying_get(client, url, allow_redirects=True, headers=req_headers)
+        async with r:
+            return r.status, r.headers, str(r.url)
     except Exception:
         return None
 
 
-def _http_get_html(session: requests.Session, url: str) -> str | None:
+async def _get_html(client: aiohttp.ClientSession, url: str) -> str | None:
     try:
-        r = session.get(url, allow_redirects=True, timeout=40)
-        if r.status_code >= 400:
-            return None
-        return r.text
+        r = await _retrying_get(client, url, allow_redirects=True)
+        async with r:
+            if r.status >= 400:
+                return None
+            return await r.text()
     except Exception:
         return None
 
 
+async def _conditional_fetch(client: aiohttp.ClientSession, url: str, parse) -> dict | None:
+    """
+    GET an HTML endpoint with If-None-Match / If-Modified-Since based on the
+    page cache. On 304 the previously-extracted data is returned without
+    re-downloading or re-parsing; otherwise the fresh HTML goes through
+    `parse` and the result is cached alongside the validators.
+    Returns None on error.
+    """
+    entry = _PAGE_CACHE.get(url)
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("lm"):
+            headers["If-Modified-Since"] = entry["lm"]
+
+    try:
+        r = await _retrying_get(client, url, allow_redirects=True, headers=headers or None)
+        async with r:
+            if r.status == 304 and entry:
+                return entry.get("data")
+            if r.status >= 400:
+                return None
+            text = await r.text()
+            etag = r.headers.get("ETag")
+            lm = r.headers.get("Last-Modified")
+    except Exception:
+        return None
+
+    data = parse(text)
+    if etag or lm:
+        _PAGE_CACHE[url] = {"etag": etag, "lm": lm, "data": data}
+    return data
+
+
+def _parse_course_links(html: str) -> dict:
+    pluginfiles, activity_pages = _extract_activity_links_from_course_html(html)
+    return {"pluginfiles": sorted(pluginfiles), "activities": sorted(activity_pages)}
+
+
+def _parse_activity_links(html: str) -> dict:
+    return {"links": [[href, txt] for href, txt in _extract_pluginfile_links_from_html(html)]}
+
+
 def _extract_pluginfile_links_from_html(html: str) -> list[tuple[str, str]]:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, BS_PARSER)
     out = []
     for a in soup.select("a[href*='pluginfile.php']"):
         href = a.get("href")
@@ -167,30 +342,32 @@ def _extract_pluginfile_links_from_html(html: str) -> list[tuple[str, str]]:
 
 
 def _extract_activity_links_from_course_html(html: str) -> tuple[set[str], set[str]]:
-    soup = BeautifulSoup(html, "html.parser")
-    pluginfiles = set()
-    activity_pages = set()
-
-    for a in soup.select("a[href]"):
-        href = a.get("href")
-        if not href:
+    # Course pages only need hrefs, so skip DOM construction entirely and pull
+    # them straight out of the markup. (Activity pages still go through
+    # BeautifulSoup because they also need the anchor text.)
+    pluginfiles: set[str] = set()
+    activity_pages: set[str] = set()
+
+    html = _SKIP_BLOCK_RE.sub("", html)
+    for tag in _A_TAG_RE.finditer(html):
+        m = _HREF_RE.search(tag.group(0))
+        if not m:
             continue
-
-        if "moodle.tau.ac.il/pluginfile.php/" in href:
-            pluginfiles.add(href)
+        href = m.group(1)
+        am = _ACT_RE.search(href)
+        if not am:
             continue
-
-        if "moodle.tau.ac.il/mod/resource/view.php" in href:
-            activity_pages.add(href)
-        elif "moodle.tau.ac.il/mod/folder/view.php" in href:
-            activity_pages.add(href)
-        elif "moodle.tau.ac.il/mod/assign/view.php" in href:
+        if "&" in href:
+            href = _html_unescape(href)  # bs4 unescaped entities; keep URLs identical
+        if am.group(1) == "pluginfile.php/":
+            pluginfiles.add(href)
+        else:
             activity_pages.add(href)
 
     return pluginfiles, activity_pages
 
 
-def _resolve_resource_view_to_file(session: requests.Session, view_url: str) -> list[str]:
+async def _resolve_resource_view_to_file(client: aiohttp.ClientSession, view_url: str) -> list[str]:
     urls: list[str] = []
 
     if "redirect=" not in view_url:
@@ -199,34 +376,52 @@ def _resolve_resource_view_to_file(session: requests.Session, view_url: str) ->
     else:
         test_url = view_url
 
-    r = _http_head_follow(session, test_url)
-    if r is not None and r.url and "pluginfile.php" in r.url:
-        urls.append(r.url)
+    probe = await _probe_headers(client, test_url)
+    if probe is not None and "pluginfile.php" in probe[2]:
+        urls.append(probe[2])
         return urls
 
-    html = _http_get_html(session, view_url)
+    html = await _get_html(client, view_url)
     if not html:
         return urls
 
+    # dedup while appending — no dict/list copies at the end
+    seen: set[str] = set()
     for href, _txt in _extract_pluginfile_links_from_html(html):
-        urls.append(href)
+        if href not in seen:
+            seen.add(href)
+            urls.append(href)
+
+    return urls
 
-    return list(dict.fromkeys(urls))
 
+async def _get_last_modified_for_file(client: aiohttp.ClientSession, file_url: str,
+                                      reference_dt: datetime) -> datetime | None:
+    # Conditional probe: validate against the cached Last-Modified when we have
+    # one, otherwise against the last run's reference date — either way a 304
+    # means the server did the filtering and there is nothing to parse.
+    cached = _URL_LM_CACHE.get(file_url)
+    ims = cached or format_datetime(reference_dt.astimezone(timezone.utc), usegmt=True)
 
-def _get_last_modified_for_file(session: requests.Session, file_url: str) -> datetime | None:
-    r = _http_head_follow(session, file_url)
-    if not r:
+    probe = await _probe_headers(client, file_url, headers={"If-Modified-Since": ims})
+    if probe is None:
         return None
-    return _parse_http_last_modified(r.headers)
+    status, headers, _final_url = probe
+
+    if status == 304:
+        # unchanged since `ims`; with no cache that means "not newer than the
+        # reference" and the file can be skipped outright
+        return _parse_http_date(cached) if cached else None
+
+    lm_raw = headers.get("Last-Modified")
+    if lm_raw:
+        _URL_LM_CACHE[file_url] = lm_raw
+        return _parse_http_date(lm_raw)
+    return None
 
 
 def _normalize_link_for_print(original_link: str, pluginfile_link: str) -> str:
-    if (
-        "mod/resource/view.php" in original_link
-        or "mod/folder/view.php" in original_link
-        or "mod/assign/view.php" in original_link
-    ):
+    if _MOD_VIEW_RE.search(original_link):
         return original_link
     return pluginfile_link
 
@@ -244,19 +439,86 @@ def _format_line(item: FoundFile) -> str:
 # STATE (last run)
 # ==========================
 
+# Per-URL Last-Modified cache (raw HTTP dates), loaded from / saved to STATE_FILE.
+# Lets _get_last_modified_for_file issue conditional HEADs across runs.
+_URL_LM_CACHE: dict[str, str] = {}
+
+# Per-URL cache for HTML endpoints: ETag/Last-Modified validators plus the
+# data already extracted from that page, so a 304 skips BeautifulSoup too.
+_PAGE_CACHE: dict[str, dict] = {}
+
+# Encrypted MoodleSession cookie carried across runs (only with STATE_COOKIE_KEY).
+_MOODLE_COOKIE_TOKEN: str | None = None
+
+
+def _cookie_fernet():
+    if not STATE_COOKIE_KEY:
+        return None
+    try:
+        from cryptography.fernet import Fernet
+        return Fernet(STATE_COOKIE_KEY.encode())
+    except Exception:
+        return None
+
+
+def load_cached_moodle_cookie() -> str | None:
+    f = _cookie_fernet()
+    if not f or not _MOODLE_COOKIE_TOKEN:
+        return None
+    try:
+        return f.decrypt(_MOODLE_COOKIE_TOKEN.encode()).decode()
+    except Exception:
+        return None
+
+
+def remember_moodle_cookie(session: requests.Session) -> None:
+    global _MOODLE_COOKIE_TOKEN
+    f = _cookie_fernet()
+    if not f:
+        return
+    try:
+        value = session.cookies.get("MoodleSession")
+    except Exception:
+        return
+    if value:
+        _MOODLE_COOKIE_TOKEN = f.encrypt(value.encode()).decode()
+
+
+def _load_state() -> dict:
+    if not os.path.exists(STATE_FILE):
+        return {}
+    try:
+        with open(STATE_FILE, "rb") as f:
+            raw = f.read()
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
 def load_last_run() -> datetime:
     # default: last hour (so first run won't spam months)
     fallback = datetime.now(TZ_IL) - timedelta(hours=1)
 
-    if not os.path.exists(STATE_FILE):
-        return fallback
+    data = _load_state()
 
+    cache = data.get("url_lm_cache")
+    if isinstance(cache, dict):
+        _URL_LM_CACHE.update(cache)
+
+    pages = data.get("page_cache")
+    if isinstance(pages, dict):
+        _PAGE_CACHE.update(pages)
+
+    token = data.get("moodle_cookie")
+    if isinstance(token, str) and token:
+        global _MOODLE_COOKIE_TOKEN
+        _MOODLE_COOKIE_TOKEN = token
+
+    iso = data.get("last_run_iso")
+    if not iso:
+        return fallback
     try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        iso = data.get("last_run_iso")
-        if not iso:
-            return fallback
         dt = datetime.fromisoformat(iso)
         if dt.tzinfo is None:
             dt = dt.replace(tzinfo=TZ_IL)
@@ -266,15 +528,35 @@ def load_last_run() -> datetime:
 
 
 def save_last_run(run_start: datetime) -> None:
-    data = {"last_run_iso": run_start.astimezone(TZ_IL).isoformat()}
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    data = {
+        "last_run_iso": run_start.astimezone(TZ_IL).isoformat(),
+        "url_lm_cache": _URL_LM_CACHE,
+        "page_cache": _PAGE_CACHE,
+    }
+    if _MOODLE_COOKIE_TOKEN:
+        data["moodle_cookie"] = _MOODLE_COOKIE_TOKEN
+
+    if orjson is not None:
+        blob = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        blob = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+    # write-then-rename so a cancelled Actions run can't leave a torn state file
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, STATE_FILE)
 
 
 # ==========================
 # TELEGRAM
 # ==========================
 
+# Keep-alive session for api.telegram.org so multi-chunk sends (and the error
+# path) reuse one TLS connection instead of handshaking per message.
+_TG_SESSION = _build_session()
+
+
 def telegram_send(text: str) -> None:
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
         print("Telegram secrets missing; skipping send.")
@@ -286,21 +568,32 @@ def telegram_send(text: str) -> None:
         "text": text,
         "disable_web_page_preview": True,
     }
-    r = requests.post(url, json=payload, timeout=30)
+    r = _TG_SESSION.post(url, json=payload, timeout=30)
     print(r.text)
 
 
 def telegram_send_many(lines: list[str], header: str) -> None:
     # Telegram limit ~4096 chars per message → split safely
     max_len = 3800
+    chunks: list[str] = []
     chunk = header + "\n"
     for line in lines:
         if len(chunk) + len(line) + 1 > max_len:
-            telegram_send(chunk)
+            chunks.append(chunk)
             chunk = header + "\n"
         chunk += line + "\n"
     if chunk.strip():
-        telegram_send(chunk)
+        chunks.append(chunk)
+
+    if len(chunks) <= 1:
+        for c in chunks:
+            telegram_send(c)
+        return
+
+    # A handful of chunks at most; 4 workers stays far under Telegram's
+    # 30 msg/sec limit while overlapping the round-trips.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(telegram_send, chunks))
 
 
 def github_run_url() -> str:
@@ -313,22 +606,118 @@ def github_run_url() -> str:
 
 
 # ==========================
-# SELENIUM: DRIVER + LOGIN
+# HTTP-ONLY SSO (fast path, no browser)
+# ==========================
+
+def _form_fields(form) -> dict[str, str]:
+    fields: dict[str, str] = {}
+    for inp in form.find_all("input"):
+        name = inp.get("name")
+        if name:
+            fields[name] = inp.get("value") or ""
+    return fields
+
+
+def nidp_login(session: requests.Session, username: str, user_id: str, password: str) -> bool:
+    """
+    Pure-requests SSO against TAU NIDP: fetch the login form, POST credentials
+    plus hidden fields, then replay the SAML auto-POST binding(s) to Moodle.
+    Returns True when the session holds a logged-in Moodle cookie.
+    Skips the entire headless-Chrome launch when it works; any surprise in the
+    flow returns False so the caller can fall back to Selenium.
+    """
+    try:
+        r = session.get(LOGIN_URL, timeout=40)
+        soup = BeautifulSoup(r.text, BS_PARSER)
+        form = soup.find("form")
+        if form is None:
+            return False
+
+        fields = _form_fields(form)
+        fields["Ecom_User_ID"] = username
+        fields["Ecom_Taz"] = user_id
+        fields["Ecom_Password"] = password
+
+        action = urljoin(r.url, form.get("action") or r.url)
+        r = session.post(action, data=fields, timeout=40, allow_redirects=True)
+
+        # NIDP answers with auto-submitting SAML forms; replay them until we
+        # land on Moodle (bounded — a healthy flow needs at most a couple).
+        for _ in range(4):
+            if "moodle.tau.ac.il" in r.url and "SAMLResponse" not in r.text:
+                break
+            soup = BeautifulSoup(r.text, BS_PARSER)
+            form = soup.find("form")
+            if form is None:
+                break
+            fields = _form_fields(form)
+            if "SAMLResponse" not in fields and "SAMLRequest" not in fields:
+                break
+            action = urljoin(r.url, form.get("action") or r.url)
+            r = session.post(action, data=fields, timeout=40, allow_redirects=True)
+
+        return session_is_logged_in(session)
+    except Exception:
+        return False
+
+
+def session_is_logged_in(session: requests.Session) -> bool:
+    try:
+        r = session.get(MY_COURSES_URL, timeout=40)
+        return r.status_code < 400 and "mycourses_coursename" in r.text
+    except Exception:
+        return False
+
+
+def fetch_courses_http(session: requests.Session) -> list[tuple[str, str]]:
+    html = _http_get_html(session, MY_COURSES_URL)
+    if not html:
+        return []
+
+    soup = BeautifulSoup(html, BS_PARSER)
+    courses: list[tuple[str, str]] = []
+    seen: set[str] = set()
+    for a in soup.select("a.mycourses_coursename"):
+        name = a.get_text(" ", strip=True)
+        href = a.get("href")
+        if name and href and "course/view.php?id=" in href and href not in seen:
+            courses.append((name, href))
+            seen.add(href)
+    return courses
+
+
+# ==========================
+# SELENIUM: DRIVER + LOGIN (fallback path)
 # ==========================
 
-def build_driver() -> webdriver.Chrome:
+def build_driver() -> "webdriver.Chrome":
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
     options = Options()
+    # Don't wait for subresources — we only need the DOM, not images/fonts.
+    options.page_load_strategy = "eager"
     options.add_argument("--disable-notifications")
     options.add_argument("--disable-popup-blocking")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    # Skipping proxy auto-detection shaves headless startup time.
+    options.add_argument("--proxy-server='direct://'")
+    options.add_argument("--proxy-bypass-list=*")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+        "credentials_enable_service": False,
+        "profile.password_manager_enabled": False,
+    })
     if HEADLESS:
         options.add_argument("--headless=new")
     # Selenium Manager will download/install matching driver automatically on GitHub runners
     return webdriver.Chrome(options=options)
 
 
-def _find_any(driver: webdriver.Chrome, by: By, values: list[str]):
+def _find_any(driver: "webdriver.Chrome", by: "By", values: list[str]):
     """
     Return the first element that is BOTH displayed and enabled.
     (Prevents picking hidden/overlayed fields that cause ElementNotInteractableException)
@@ -343,11 +732,15 @@ def _find_any(driver: webdriver.Chrome, by: By, values: list[str]):
     return None
 
 
-def maybe_login_nidp(driver: webdriver.Chrome) -> None:
+def maybe_login_nidp(driver: "webdriver.Chrome") -> None:
     """
     Fill the TAU NIDP SSO form if it appears.
     Robust against multiple possible field IDs AND hidden duplicates.
     """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.common.keys import Keys
+    from selenium.webdriver.support.ui import WebDriverWait
+
     wait = WebDriverWait(driver, WAIT_SEC)
 
     user_ids = ["Ecom_User_ID", "Ecom_UserID", "Ecom_Username", "username", "user"]
@@ -409,7 +802,9 @@ def maybe_login_nidp(driver: webdriver.Chrome) -> None:
     pass_field.send_keys(Keys.RETURN)
 
 
-def ensure_on_moodle(driver: webdriver.Chrome) -> None:
+def ensure_on_moodle(driver: "webdriver.Chrome") -> None:
+    from selenium.webdriver.support.ui import WebDriverWait
+
     wait = WebDriverWait(driver, WAIT_SEC)
 
     def reached_moodle_or_portal(d):
@@ -427,7 +822,9 @@ def ensure_on_moodle(driver: webdriver.Chrome) -> None:
     wait.until(lambda d: "moodle.tau.ac.il" in d.current_url.lower())
 
 
-def click_login_if_guest(driver: webdriver.Chrome) -> bool:
+def click_login_if_guest(driver: "webdriver.Chrome") -> bool:
+    from selenium.webdriver.common.by import By
+
     selectors = [
         "#usernavigation a[href*='/login/index.php']",
         "a[href='https://moodle.tau.ac.il/login/index.php']",
@@ -455,18 +852,33 @@ def click_login_if_guest(driver: webdriver.Chrome) -> bool:
     return False
 
 
-def ensure_logged_in_moodle(driver: webdriver.Chrome) -> None:
+def ensure_logged_in_moodle(driver: "webdriver.Chrome") -> None:
     """
     Go to MyCourses.
     If guest access -> click login -> complete SSO -> back to MyCourses.
     """
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     wait = WebDriverWait(driver, WAIT_SEC)
     driver.get(MY_COURSES_URL)
-    wait.until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-    time.sleep(0.8)
+
+    # Wait for the actual DOM we branch on (course list or guest login link)
+    # instead of sleeping a fixed amount.
+    try:
+        wait.until(EC.any_of(
+            EC.presence_of_element_located((By.CSS_SELECTOR, "a.mycourses_coursename")),
+            EC.presence_of_element_located((By.CSS_SELECTOR, "#usernavigation a[href*='/login/index.php']")),
+        ))
+    except Exception:
+        pass
 
     if click_login_if_guest(driver):
-        time.sleep(1.2)
+        try:
+            WebDriverWait(driver, 5).until(EC.url_contains("nidp.tau.ac.il"))
+        except Exception:
+            pass
 
         if "nidp.tau.ac.il" in driver.current_url.lower():
             maybe_login_nidp(driver)
@@ -487,104 +899,161 @@ def ensure_logged_in_moodle(driver: webdriver.Chrome) -> None:
         raise RuntimeError("Still guest access on MyCourses; SSO did not complete automatically.")
 
 
-def get_courses(driver: webdriver.Chrome) -> list[tuple[str, str]]:
+def get_courses(driver: "webdriver.Chrome") -> list[tuple[str, str]]:
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     ensure_logged_in_moodle(driver)
 
     wait = WebDriverWait(driver, WAIT_SEC)
     wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a.mycourses_coursename")))
 
-    links = driver.find_elements(By.CSS_SELECTOR, "a.mycourses_coursename")
-    courses: list[tuple[str, str]] = []
-    for a in links:
-        name = (a.text or "").strip()
-        href = a.get_attribute("href")
-        if name and href and "course/view.php?id=" in href:
-            courses.append((name, href))
+    # One WebDriver round-trip for all anchors instead of two per course
+    # (.text + .get_attribute each cross the wire).
+    pairs = driver.execute_script(
+        "return Array.from(document.querySelectorAll('a.mycourses_coursename'))"
+        ".map(a => [a.textContent.trim(), a.href]);"
+    ) or []
 
-    uniq: list[tuple[str, str]] = []
+    courses: list[tuple[str, str]] = []
     seen = set()
-    for n, u in courses:
-        if u not in seen:
-            uniq.append((n, u))
-            seen.add(u)
-    return uniq
+    for name, href in pairs:
+        name = (name or "").strip()
+        if name and href and "course/view.php?id=" in href and href not in seen:
+            courses.append((name, href))
+            seen.add(href)
+    return courses
 
 
 # ==========================
 # MAIN SCAN LOGIC
 # ==========================
 
-def scan_all(session: requests.Session, courses: list[tuple[str, str]], reference_dt: datetime) -> list[FoundFile]:
+def _aiohttp_client_from_session(session: requests.Session) -> aiohttp.ClientSession:
+    """
+    Build an aiohttp client mirroring the logged-in requests session: same
+    headers, same cookies (with their domains), one connection pool sized
+    like the old thread fan-out.
+    """
+    connector = aiohttp.TCPConnector(limit=SCAN_WORKERS, limit_per_host=SCAN_WORKERS)
+    client = aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=60),
+        headers=dict(session.headers),
+    )
+    for c in session.cookies:
+        domain = (c.domain or "moodle.tau.ac.il").lstrip(".")
+        client.cookie_jar.update_cookies({c.name: c.value}, response_url=URL(f"https://{domain}/"))
+    return client
+
+
+async def _scan_all_async(session: requests.Session, courses: list[tuple[str, str]],
+                          reference_dt: datetime) -> list[FoundFile]:
     found: list[FoundFile] = []
     seen_files: set[tuple[str, str]] = set()
 
-    for course_name_raw, course_url in courses:
-        course_name_display = _course_display_name(course_name_raw)
+    # candidate = (course_name_raw, course_name_display, file_url, file_name, link_for_print)
+    candidates: list[tuple[str, str, str, str, str]] = []
 
-        html = _http_get_html(session, course_url)
-        if not html:
-            continue
+    def _add_candidate(course_name_raw: str, course_name_display: str, course_url: str,
+                       pf: str, fname: str, link: str) -> None:
+        key = (course_url, pf)
+        if key in seen_files:
+            return
+        seen_files.add(key)
+        candidates.append((course_name_raw, course_name_display, pf, fname, link))
 
-        pluginfiles, activity_pages = _extract_activity_links_from_course_html(html)
+    sem = asyncio.Semaphore(SCAN_WORKERS)
 
-        for pf in sorted(pluginfiles):
-            key = (course_url, pf)
-            if key in seen_files:
-                continue
-            seen_files.add(key)
+    async def bound(coro):
+        async with sem:
+            return await coro
 
-            lm = _get_last_modified_for_file(session, pf)
-            if not lm:
+    client = _aiohttp_client_from_session(session)
+    try:
+        # Stage 1: fetch all course pages (conditional; 304 reuses cached parse)
+        course_datas = await asyncio.gather(*(
+            bound(_conditional_fetch(client, course_url, _parse_course_links))
+            for _name, course_url in courses
+        ))
+
+        # Stage 2: walk extracted links, collect direct pluginfiles + activity pages
+        resource_views: list[tuple[str, str, str, str]] = []  # (raw, display, course_url, act)
+        other_activities: list[tuple[str, str, str, str]] = []
+
+        for (course_name_raw, course_url), data in zip(courses, course_datas):
+            if not data:
                 continue
-
-            if lm > reference_dt:
-                fname = _safe_filename_from_url(pf)
-                found.append(FoundFile(course_name_raw, course_name_display, fname, lm, pf))
-
-        for act in sorted(activity_pages):
-            if "mod/resource/view.php" in act:
-                pf_urls = _resolve_resource_view_to_file(session, act)
-                for pf in pf_urls:
-                    key = (course_url, pf)
-                    if key in seen_files:
-                        continue
-                    seen_files.add(key)
-
-                    lm = _get_last_modified_for_file(session, pf)
-                    if not lm:
-                        continue
-
-                    if lm > reference_dt:
-                        fname = _safe_filename_from_url(pf)
-                        link_for_print = _normalize_link_for_print(act, pf)
-                        found.append(FoundFile(course_name_raw, course_name_display, fname, lm, link_for_print))
-            else:
-                act_html = _http_get_html(session, act)
-                if not act_html:
+            course_name_display = _course_display_name(course_name_raw)
+
+            for pf in data["pluginfiles"]:
+                _add_candidate(course_name_raw, course_name_display, course_url,
+                               pf, _safe_filename_from_url(pf), pf)
+
+            for act in data["activities"]:
+                if "mod/resource/view.php" in act:
+                    resource_views.append((course_name_raw, course_name_display, course_url, act))
+                else:
+                    other_activities.append((course_name_raw, course_name_display, course_url, act))
+
+        # Stage 2b: resolve resource views + fetch the remaining activity pages
+        resolved = await asyncio.gather(*(
+            bound(_resolve_resource_view_to_file(client, rv[3])) for rv in resource_views
+        ))
+        act_datas = await asyncio.gather(*(
+            bound(_conditional_fetch(client, oa[3], _parse_activity_links)) for oa in other_activities
+        ))
+
+        for (course_name_raw, course_name_display, course_url, act), pf_urls in zip(resource_views, resolved):
+            for pf in pf_urls:
+                _add_candidate(course_name_raw, course_name_display, course_url,
+                               pf, _safe_filename_from_url(pf), _normalize_link_for_print(act, pf))
+
+        for (course_name_raw, course_name_display, course_url, act), act_data in zip(other_activities, act_datas):
+            if not act_data:
+                continue
+            for pf, txt in act_data["links"]:
+                if "pluginfile.php" not in pf:
                     continue
+                fname = (txt.strip() or _safe_filename_from_url(pf))
+                _add_candidate(course_name_raw, course_name_display, course_url,
+                               pf, fname, _normalize_link_for_print(act, pf))
+
+        # Stage 3: fetch Last-Modified once per unique file URL — the same
+        # pluginfile can be a candidate under several courses/activities
+        # (seen_files keys on (course_url, pf), not on pf alone).
+        unique_urls = list(dict.fromkeys(c[2] for c in candidates))
+        lms = await asyncio.gather(*(
+            bound(_get_last_modified_for_file(client, u, reference_dt)) for u in unique_urls
+        ))
+        url_lm: dict[str, datetime | None] = dict(zip(unique_urls, lms))
+    finally:
+        await client.close()
 
-                for pf, txt in _extract_pluginfile_links_from_html(act_html):
-                    if "pluginfile.php" not in pf:
-                        continue
-
-                    key = (course_url, pf)
-                    if key in seen_files:
-                        continue
-                    seen_files.add(key)
-
-                    lm = _get_last_modified_for_file(session, pf)
-                    if not lm:
-                        continue
-
-                    if lm > reference_dt:
-                        fname = (txt.strip() or _safe_filename_from_url(pf))
-                        link_for_print = _normalize_link_for_print(act, pf)
-                        found.append(FoundFile(course_name_raw, course_name_display, fname, lm, link_for_print))
+    for course_name_raw, course_name_display, pf, fname, link in candidates:
+        lm = url_lm.get(pf)
+        if not lm:
+            continue
+        if lm > reference_dt:
+            found.append(FoundFile(course_name_raw, course_name_display, fname,
+                                   lm.astimezone(TZ_IL), link))
 
     found.sort(key=lambda x: (x.course_name_display, x.last_modified_il, x.file_name.lower()))
     return found
 
 
+def scan_all(session: requests.Session, courses: list[tuple[str, str]], reference_dt: datetime) -> list[FoundFile]:
+    """
+    Three-stage scan on a single asyncio event loop (one connection pool,
+    no thread stacks or GIL hand-offs):
+      1. fetch all course pages concurrently
+      2. parse; fetch activity pages / resolve resource views concurrently
+      3. fetch Last-Modified for all candidate files concurrently
+    """
+    return asyncio.run(_scan_all_async(session, courses, reference_dt))
+
+
 # ==========================
 # ENTRY
 # ==========================
@@ -597,36 +1066,62 @@ def main():
     run_start = datetime.now(TZ_IL)
     last_run = load_last_run()
 
-    driver = build_driver()
-    try:
-        driver.get(LOGIN_URL)
+    session = _build_session()
+    courses: list[tuple[str, str]] = []
+
+    # Fastest path: a still-valid session cookie from a previous run — no login at all.
+    cookie = load_cached_moodle_cookie()
+    if cookie:
+        session.cookies.set("MoodleSession", cookie, domain="moodle.tau.ac.il", path="/")
+        courses = fetch_courses_http(session)
+        if courses:
+            print("Reused cached Moodle session (no login needed).")
+        else:
+            # stale cookie — start clean and fall through to SSO
+            session.cookies.clear()
+
+    # Fast path: requests-only SSO — no headless Chrome launch.
+    if not courses and nidp_login(session, USERNAME, USER_ID, PASSWORD):
+        courses = fetch_courses_http(session)
+        if courses:
+            print("Logged in via HTTP SSO (no browser).")
+
+    if not courses:
+        # Fallback: the SAML flow needed JS (or changed) — do the full Selenium SSO.
+        print("HTTP SSO did not complete; falling back to Selenium.")
+        driver = build_driver()
+        try:
+            driver.get(LOGIN_URL)
 
-        # if we see NIDP form -> fill; otherwise might already be logged in
-        maybe_login_nidp(driver)
-        ensure_on_moodle(driver)
+            # if we see NIDP form -> fill; otherwise might already be logged in
+            maybe_login_nidp(driver)
+            ensure_on_moodle(driver)
 
-        courses = get_courses(driver)
-        print(f"\nFound {len(courses)} courses.\n")
+            courses = get_courses(driver)
+            session = _session_from_selenium_cookies(driver)
+        finally:
+            try:
+                driver.quit()
+            except Exception:
+                pass
 
-        session = _session_from_selenium_cookies(driver)
-        results = scan_all(session, courses, last_run)
+    print(f"\nFound {len(courses)} courses.\n")
 
-        # Update state even if no results (so next run checks only since now)
-        save_last_run(run_start)
+    # Persist the session cookie (encrypted) so the next run can skip login.
+    remember_moodle_cookie(session)
 
-        if not results:
-            print("No updates since last run. (No Telegram message will be sent.)")
-            return
+    results = scan_all(session, courses, last_run)
 
-        lines = [_format_line(x) for x in results]
-        header = f"📌 עדכונים במודל מאז {last_run.strftime('%d.%m.%Y %H:%M')} ({len(lines)}):"
-        telegram_send_many(lines, header)
+    # Update state even if no results (so next run checks only since now)
+    save_last_run(run_start)
 
-    finally:
-        try:
-            driver.quit()
-        except Exception:
-            pass
+    if not results:
+        print("No updates since last run. (No Telegram message will be sent.)")
+        return
+
+    lines = [_format_line(x) for x in results]
+    header = f"📌 עדכונים במודל מאז {last_run.strftime('%d.%m.%Y %H:%M')} ({len(lines)}):"
+    telegram_send_many(lines, header)
 
 
 if __name__ == "__main__":